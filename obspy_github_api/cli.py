@@ -2,24 +2,51 @@
 Command line Interface for obspy_github_api
 """
 import json
-from typing import Optional
+import os
+from typing import List, Optional
 
 import typer
 
 from obspy_github_api.obspy_github_api import (
     make_ci_json_config,
+    make_ci_json_config_multi_repo,
+    FanOutError,
     get_obspy_module_lists,
+    read_module_durations,
+    split_modules_into_shards,
     _append_obspy,
 )
 
 app = typer.Typer()
 
 DEFAULT_CONFIG_PATH = "obspy_config/conf.json"
+# directory shared between concurrent CI jobs to cache API results in
+DEFAULT_CACHE_DIR = os.environ.get("OBSHUB_CACHE_DIR", None)
+
+
+def _check_shards(shards, shard_index=0):
+    """
+    Raise if the number of shards or the shard index is invalid.
+    """
+    if shards < 1:
+        raise typer.BadParameter("number of shards must be at least 1")
+    if not 0 <= shard_index < shards:
+        raise typer.BadParameter(
+            "shard index must be between 0 and {}".format(shards - 1)
+        )
 
 
 @app.command()
 def make_config(
-    issue_number: int, path: str = DEFAULT_CONFIG_PATH, token: Optional[str] = None
+    issue_number: int,
+    path: str = DEFAULT_CONFIG_PATH,
+    token: Optional[str] = None,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    changed_files: bool = False,
+    shards: int = 1,
+    durations: Optional[str] = None,
+    owner: str = "obspy",
+    repo: str = "obspy",
 ):
     """
     Create ObsPy's configuration json file for a particular issue.
@@ -32,24 +59,98 @@ def make_config(
         module_list - A string of requested modules separated by commas.
         module_list_spaces - A string of requested modules separated by spaces.
         docs - True if a doc build is requested.
+
+    If a cache directory is given (or set via the OBSHUB_CACHE_DIR env
+    variable) concurrent invocations for the same issue share the results of
+    a single set of API requests.
+
+    With --changed-files, all modules touched by the pull request's changed
+    files are tested as well.
+
+    With --shards N, the module list is also split into N shards balanced by
+    the test durations in the --durations json/csv file and stored as
+    module_list_shard_I and module_list_spaces_shard_I (I = 0 ... N-1).
+    """
+    _check_shards(shards)
+    make_ci_json_config(
+        issue_number,
+        path=path,
+        token=token,
+        cache_dir=cache_dir,
+        changed_files=changed_files,
+        shards=shards,
+        durations_path=durations,
+        owner=owner,
+        repo=repo,
+    )
+
+
+@app.command()
+def make_config_multi_repo(
+    issues: List[str],
+    path: str = DEFAULT_CONFIG_PATH,
+    token: Optional[str] = None,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    changed_files: bool = False,
+    shards: int = 1,
+    durations: Optional[str] = None,
+):
     """
-    make_ci_json_config(issue_number, path=path, token=token)
+    Create a configuration json file for issues of multiple repositories.
+
+    Issues are given as OWNER/REPO#NUMBER (e.g. obspy/obspy#101) and are
+    processed concurrently over a single github client, sharing its rate
+    limit. The config file maps each issue to the values described in
+    make-config, use read-config-value with --issue to read them.
+
+    If the config of any issue can not be made, no file is written and the
+    command fails.
+    """
+    _check_shards(shards)
+    try:
+        make_ci_json_config_multi_repo(
+            issues,
+            path=path,
+            token=token,
+            cache_dir=cache_dir,
+            changed_files=changed_files,
+            shards=shards,
+            durations_path=durations,
+        )
+    except FanOutError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
 
 
 @app.command()
-def read_config_value(name: str, path: str = DEFAULT_CONFIG_PATH):
+def read_config_value(
+    name: str, path: str = DEFAULT_CONFIG_PATH, issue: Optional[str] = None
+):
     """
     Read a value from the configuration file.
+
+    For files created by make-config-multi-repo, the issue the value belongs
+    to has to be given as OWNER/REPO#NUMBER with --issue.
     """
     with open(path, "r") as fi:
         params = json.load(fi)
+    if issue is not None:
+        if issue not in params:
+            raise typer.BadParameter("issue {} not in {}".format(issue, path))
+        params = params[issue]
     value = params[name]
     print(value)
     return value
 
 
 @app.command()
-def get_module_list(group: str = "default", sep=" "):
+def get_module_list(
+    group: str = "default",
+    sep=" ",
+    shards: int = 1,
+    shard_index: int = 0,
+    durations: Optional[str] = None,
+):
     """
     Print and return module lists for use with coverage.
 
@@ -62,8 +163,21 @@ def get_module_list(group: str = "default", sep=" "):
             network
     sep
         Character to separate modules, ' ' else ','
+    shards
+        Number of shards to split the module list into.
+    shard_index
+        Index of the shard to print (0 ... shards - 1).
+    durations
+        Path to a json or csv file with historical test durations per module,
+        used to balance the shards.
     """
+    _check_shards(shards, shard_index)
     mod_list = get_obspy_module_lists()[group]
+    if shards > 1:
+        duration_dict = read_module_durations(durations) if durations else None
+        mod_list = split_modules_into_shards(mod_list, shards, duration_dict)[
+            shard_index
+        ]
     with_obspy = _append_obspy(mod_list)
     print(sep.join(with_obspy))
     return with_obspy
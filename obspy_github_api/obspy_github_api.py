@@ -1,19 +1,64 @@
 # -*- coding: utf-8 -*-
 import ast
+import csv
 import datetime
+import heapq
 import json
 import os
 import re
+import threading
 import warnings
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import lru_cache, partial
 from pathlib import Path
 
 import github3
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, not available on Windows
+    fcntl = None
 
 # regex pattern in comments for requesting a docs build
 PATTERN_DOCS_BUILD = r"\+DOCS"
 # regex pattern in comments for requesting tests of specific submodules
 PATTERN_TEST_MODULES = r"\+TESTS:([a-zA-Z0-9_\.,]*)"
+# maximum page size allowed by the github API for listings
+MAX_PER_PAGE = 100
+# size of the connection pool of the github client, also the default number
+# of repositories processed concurrently in multi-repository mode
+POOL_MAXSIZE = 10
+
+# budget of API requests of the current task, see _rate_limit_budget
+_request_budget = ContextVar("request_budget", default=None)
+
+
+class RateLimitBudgetExceeded(Exception):
+    """
+    Raised when a task has used up its share of the API rate limit.
+    """
+
+
+class _RequestBudget(object):
+    """
+    Counter of the API requests a task may still make, shared between all
+    threads working for the task.
+    """
+
+    def __init__(self, n_requests):
+        self.remaining = n_requests
+        self._lock = threading.Lock()
+
+    def spend(self):
+        with self._lock:
+            self.remaining -= 1
+
+    @property
+    def exhausted(self):
+        return self.remaining <= 0
 
 
 @lru_cache()
@@ -34,10 +79,247 @@ def get_github_client(token=None):
         gh = github3.GitHub()
     else:
         gh = github3.login(token=token)
+    # the client is shared between threads in multi-repository mode
+    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+    gh.session.mount("https://", adapter)
+    gh.session.hooks["response"].append(_count_request)
     return gh
 
 
-def get_requested_modules(issue_number, token=None):
+def _count_request(response, *args, **kwargs):
+    """
+    Response hook counting API requests against the current task's budget.
+    """
+    budget = _request_budget.get()
+    if budget is not None:
+        budget.spend()
+
+
+@contextmanager
+def _rate_limit_budget(n_requests):
+    """
+    Limit the API requests of the current task to ``n_requests``.
+
+    The budget is stored in a context variable, threads started on behalf of
+    the task (see :class:`PaginatedListing`) have to run in a copy of the
+    current context to share it. It is only checked where work can be
+    stopped, see :func:`_budget_exhausted` and :func:`_check_budget`.
+    ``None`` means no limit.
+    """
+    budget = None if n_requests is None else _RequestBudget(n_requests)
+    reset_token = _request_budget.set(budget)
+    try:
+        yield
+    finally:
+        _request_budget.reset(reset_token)
+
+
+def _budget_exhausted():
+    """
+    Return ``True`` if the current task has used up its request budget.
+    """
+    budget = _request_budget.get()
+    return budget is not None and budget.exhausted
+
+
+def _check_budget():
+    """
+    Raise :class:`RateLimitBudgetExceeded` if the current task has used up
+    its request budget.
+    """
+    if _budget_exhausted():
+        raise RateLimitBudgetExceeded("API request budget used up")
+
+
+def _warn_budget_exhausted(owner, repo):
+    msg = "API request budget for {}/{} used up, skipping PRs".format(owner, repo)
+    warnings.warn(msg)
+
+
+def get_rate_limit_remaining(token=None):
+    """
+    Return the number of remaining core API requests of the github client.
+
+    :rtype: int or ``None``
+    :returns: Remaining requests or ``None`` if it could not be determined.
+    """
+    gh = get_github_client(token)
+    try:
+        return gh.rate_limit()["resources"]["core"]["remaining"]
+    except (github3.exceptions.GitHubError, KeyError, TypeError):
+        return None
+
+
+def parse_repository(name):
+    """
+    Split a repository name like 'obspy/obspy' into owner and repository.
+
+    :rtype: tuple of str
+    """
+    owner, sep, repo = name.partition("/")
+    if not sep or not owner or not repo or "/" in repo:
+        raise ValueError("Invalid repository name: {}".format(name))
+    return owner, repo
+
+
+def parse_issue(name):
+    """
+    Split an issue name like 'obspy/obspy#101' into owner, repository and
+    issue number.
+
+    :rtype: tuple
+    """
+    repository, sep, number = name.partition("#")
+    if not sep or not number.isdigit():
+        raise ValueError("Invalid issue name: {}".format(name))
+    owner, repo = parse_repository(repository)
+    return owner, repo, int(number)
+
+
+class FanOutError(Exception):
+    """
+    Raised by :func:`fan_out` if tasks failed and errors are not ignored.
+
+    :ivar results: Mapping of names to the results of succeeded tasks.
+    :ivar failed: Mapping of names to the exceptions of failed tasks.
+    """
+
+    def __init__(self, results, failed):
+        self.results = results
+        self.failed = failed
+        msg = "Failed tasks: " + ", ".join(
+            "{} ({!r})".format(name, e) for name, e in failed.items()
+        )
+        super(FanOutError, self).__init__(msg)
+
+
+def fan_out(tasks, token=None, max_workers=POOL_MAXSIZE, raise_errors=False):
+    """
+    Run tasks (e.g. one per repository) concurrently over the shared client.
+
+    The remaining API rate limit is split evenly between the tasks. Each task
+    stops once its share is used up, scans of pull requests return partial
+    results, other work raises :class:`RateLimitBudgetExceeded`.
+
+    A failing task (e.g. a misspelled repository) does not affect the other
+    tasks. By default it is reported in a warning and left out of the
+    results, with ``raise_errors=True`` a :class:`FanOutError` is raised once
+    all tasks are done.
+
+    :type tasks: dict
+    :param tasks: Mapping of names to callables without arguments.
+    :rtype: dict
+    :returns: Mapping of names to the return values of the callables that
+        succeeded.
+    """
+    if not tasks:
+        return {}
+    remaining = get_rate_limit_remaining(token)
+    budget = None if remaining is None else remaining // len(tasks)
+
+    def run(func):
+        with _rate_limit_budget(budget):
+            return func()
+
+    out = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        # every task runs in its own context, so it gets its own budget
+        futures = {
+            name: executor.submit(copy_context().run, run, func)
+            for name, func in tasks.items()
+        }
+        for name, future in futures.items():
+            try:
+                out[name] = future.result()
+            except Exception as e:
+                failed[name] = e
+    if failed and raise_errors:
+        raise FanOutError(out, failed)
+    for name, e in failed.items():
+        msg = "Task {} failed: {!r}".format(name, e)
+        warnings.warn(msg)
+    return out
+
+
+def _get_issue_cache_key(issue_number, token=None, owner="obspy", repo="obspy"):
+    """
+    Return a cache key for results derived from the given issue.
+
+    The key includes the issue's ``updated_at`` timestamp so that any edit to
+    the issue or a new comment invalidates previously cached results. Getting
+    the key costs one API request, so fetch it once and derive the keys of
+    all cached results from it (see :func:`_cached_call`).
+    """
+    gh = get_github_client(token)
+    issue = gh.issue(owner, repo, issue_number)
+    updated_at = issue.updated_at
+    if isinstance(updated_at, datetime.datetime):
+        updated_at = updated_at.strftime("%Y%m%dT%H%M%S")
+    return "{}_{}_{}_{}".format(owner, repo, issue_number, updated_at)
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Hold an exclusive lock on given file (no-op where fcntl is unavailable).
+    """
+    with open(path, "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _single_flight(cache_dir, key, func):
+    """
+    Return the result of ``func()``, computing it at most once per cache key.
+
+    Concurrent processes sharing ``cache_dir`` (e.g. the jobs of a CI matrix)
+    serialize on a lock file for the key. The first process calls ``func``
+    and writes its (json serializable) result to the cache, all others wait
+    for the lock and reuse the cached result.
+
+    :type cache_dir: str or :class:`pathlib.Path` or ``None``
+    :param cache_dir: Directory shared by all processes. If ``None``, no
+        caching is done and ``func`` is simply called.
+    """
+    if cache_dir is None:
+        return func()
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(exist_ok=True, parents=True)
+    path = cache_dir / (key + ".json")
+    with _file_lock(str(cache_dir / (key + ".lock"))):
+        if path.exists():
+            with path.open("r") as fi:
+                return json.load(fi)
+        result = func()
+        # write to a temporary file first, so that readers never see a
+        # partially written cache file
+        path_tmp = cache_dir / "{}.{}.tmp".format(key, os.getpid())
+        with path_tmp.open("w") as fi:
+            json.dump(result, fi)
+        os.replace(str(path_tmp), str(path))
+    return result
+
+
+def _cached_call(cache_dir, name, issue_key, func):
+    """
+    Call ``func()`` through :func:`_single_flight` with the key of the result
+    called ``name`` derived from the issue key (see
+    :func:`_get_issue_cache_key`).
+
+    If ``cache_dir`` is ``None`` ``func`` is called directly.
+    """
+    if cache_dir is None:
+        return func()
+    return _single_flight(cache_dir, "{}_{}".format(name, issue_key), func)
+
+
+def get_requested_modules(issue_number, token=None, owner="obspy", repo="obspy"):
     """
     Checks if tests of specific modules are requested for given issue number
     (e.g. by magic string '+TESTS:clients.fdsn,clients.arclink' or '+TESTS:ALL'
@@ -50,7 +332,7 @@ def get_requested_modules(issue_number, token=None):
         requested or ``True`` if all modules should be tested.
     """
     gh = get_github_client(token)
-    issue = gh.issue("obspy", "obspy", issue_number)
+    issue = gh.issue(owner, repo, issue_number)
     modules_to_test = set()
 
     # process issue body/description
@@ -91,8 +373,65 @@ def get_obspy_module_lists(module_path="./obspy/core/util/base.py"):
     return dict(all=ALL_MODULES, default=DEFAULT_MODULES, network=NETWORK_MODULES)
 
 
+def get_module_path_index(module_list):
+    """
+    Build an index mapping source path prefixes to ObsPy submodules.
+
+    E.g. ``{"obspy/clients/fdsn/": "clients.fdsn", ...}``.
+
+    :rtype: dict
+    """
+    return {"obspy/{}/".format(mod.replace(".", "/")): mod for mod in module_list}
+
+
+def get_modules_for_paths(paths, path_index):
+    """
+    Map (repository relative) file paths to the ObsPy submodules they belong
+    to, using an index from :func:`get_module_path_index`.
+
+    Each path is assigned to the submodule with the longest matching path
+    prefix, paths outside of any submodule are ignored.
+
+    :rtype: list
+    """
+    modules = set()
+    for path in paths:
+        parts = path.split("/")[:-1]
+        # walk up the directory tree, deepest directory first
+        for i in range(len(parts), 1, -1):
+            prefix = "/".join(parts[:i]) + "/"
+            if prefix in path_index:
+                modules.add(path_index[prefix])
+                break
+    return sorted(modules)
+
+
+def get_changed_files(issue_number, token=None, owner="obspy", repo="obspy"):
+    """
+    Return the paths of all files changed in the pull request with given
+    number.
+
+    :rtype: list of str
+    :returns: Changed file paths, empty if the issue is not a pull request.
+    """
+    gh = get_github_client(token)
+    try:
+        pr = gh.pull_request(owner, repo, issue_number)
+    except github3.exceptions.NotFoundError:
+        return []
+    if pr is None:
+        return []
+    return [changed_file.filename for changed_file in pr.files()]
+
+
 def get_module_test_list(
-    issue_number, token=None, module_path="./obspy/core/util/base.py",
+    issue_number,
+    token=None,
+    module_path="./obspy/core/util/base.py",
+    cache_dir=None,
+    changed_files=False,
+    owner="obspy",
+    repo="obspy",
 ):
     """
     Gets the list of modules that should be tested for the given issue number.
@@ -101,16 +440,42 @@ def get_module_test_list(
     core.util.base, else use `constants_path` to look for the constants file
     which contains these lists and no other ObsPy imports.
 
+    :type cache_dir: str
+    :param cache_dir: Optional directory to cache the results of API requests
+        in, shared between concurrent processes (see :func:`_single_flight`).
+    :type changed_files: bool
+    :param changed_files: Whether to also test all modules touched by the
+        files changed in the pull request (see :func:`get_changed_files`).
     :rtype: list
     :returns: List of modules names to test for given issue number.
     """
     mod_dict = get_obspy_module_lists(module_path)
-    modules_to_test = get_requested_modules(issue_number, token)
+    issue_key = None
+    if cache_dir is not None:
+        issue_key = _get_issue_cache_key(issue_number, token, owner=owner, repo=repo)
+    modules_to_test = _cached_call(
+        cache_dir,
+        "requested_modules",
+        issue_key,
+        lambda: get_requested_modules(issue_number, token, owner=owner, repo=repo),
+    )
     # Set to default or all
     if modules_to_test is False:
         modules_to_test = mod_dict["default"]
     elif modules_to_test is True:
         modules_to_test = mod_dict["all"]
+    if changed_files:
+        _check_budget()
+        paths = _cached_call(
+            cache_dir,
+            "changed_files",
+            issue_key,
+            lambda: get_changed_files(issue_number, token, owner=owner, repo=repo),
+        )
+        path_index = get_module_path_index(mod_dict["all"])
+        modules_to_test = set.union(
+            set(modules_to_test), get_modules_for_paths(paths, path_index)
+        )
     # filter out any modules which don't exist
     modules_to_test = set(modules_to_test) & set(mod_dict["all"])
     return sorted(list(set.union(set(mod_dict["default"]), modules_to_test)))
@@ -145,7 +510,7 @@ def get_values_from_module(node, names):
     return out
 
 
-def check_docs_build_requested(issue_number, token=None):
+def check_docs_build_requested(issue_number, token=None, owner="obspy", repo="obspy"):
     """
     Check if a docs build was requested for given issue number (by magic string
     '+DOCS' anywhere in issue comments).
@@ -153,7 +518,7 @@ def check_docs_build_requested(issue_number, token=None):
     :rtype: bool
     """
     gh = get_github_client(token)
-    issue = gh.issue("obspy", "obspy", issue_number)
+    issue = gh.issue(owner, repo, issue_number)
     if re.search(PATTERN_DOCS_BUILD, issue.body):
         return True
     for comment in issue.comments():
@@ -162,18 +527,127 @@ def check_docs_build_requested(issue_number, token=None):
     return False
 
 
-def get_pull_requests(state="open", sort="updated", direction="desc", token=None):
+class PaginatedListing(object):
+    """
+    Reusable snapshot of a paginated github3 listing.
+
+    Items are fetched by a background thread, so that the next page is
+    requested while the items of the current page are being processed. The
+    thread fetches at most ``lookahead`` items (i.e. one page) beyond the
+    items handed out so far and blocks until the consumer moves on, so it has
+    to be stopped with :meth:`close` or by using the listing as a context
+    manager, which also covers consumers stopping early or failing. It
+    also stops when the API request budget of the task that created the
+    listing is used up (see :func:`fan_out`).
+    Fetched items are kept, so the listing can be iterated any number of
+    times (e.g. for logging and processing) while only being fetched once.
+    """
+
+    def __init__(self, iterator, lookahead=MAX_PER_PAGE):
+        self._items = []
+        self._lookahead = lookahead
+        self._consumed = 0
+        self._done = False
+        self._closed = False
+        self._exception = None
+        self._condition = threading.Condition()
+        # run in a copy of the current context to share the request budget
+        self._thread = threading.Thread(
+            target=copy_context().run, args=(self._fetch, iterator)
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _fetch(self, iterator):
+        try:
+            for item in iterator:
+                with self._condition:
+                    self._items.append(item)
+                    self._condition.notify_all()
+                    while (
+                        len(self._items) - self._consumed >= self._lookahead
+                        and not self._closed
+                    ):
+                        self._condition.wait()
+                    if self._closed or _budget_exhausted():
+                        break
+        except Exception as e:
+            self._exception = e
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        Stop fetching further items, e.g. when the consumer stops early.
+
+        Items fetched so far remain available.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self._condition:
+                if i > self._consumed:
+                    self._consumed = i
+                    self._condition.notify_all()
+                while i >= len(self._items) and not self._done:
+                    self._condition.wait()
+                if i >= len(self._items):
+                    if self._exception is not None:
+                        raise self._exception
+                    return
+                item = self._items[i]
+            yield item
+            i += 1
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def get_paginated_listing(iterator, per_page=MAX_PER_PAGE):
+    """
+    Return a :class:`PaginatedListing` for a (not yet started) github3
+    iterator, requesting pages of ``per_page`` items to save round trips and
+    prefetching at most one page ahead.
+    """
+    iterator.params["per_page"] = per_page
+    return PaginatedListing(iterator, lookahead=per_page)
+
+
+def get_pull_requests(
+    state="open",
+    sort="updated",
+    direction="desc",
+    token=None,
+    owner="obspy",
+    repo="obspy",
+):
     """
     Fetch a list of issue numbers for pull requests recently updated
     first, along with the PR data.
+
+    :rtype: :class:`PaginatedListing`
+    :returns: Reusable listing of pull requests, fetched in the background.
+        Use it as a context manager to stop the background thread when done.
     """
     gh = get_github_client(token)
-    repo = gh.repository("obspy", "obspy")
-    prs = repo.pull_requests(state=state, sort=sort, direction=direction)
-    return prs
+    repository = gh.repository(owner, repo)
+    prs = repository.pull_requests(state=state, sort=sort, direction=direction)
+    return get_paginated_listing(prs)
 
 
-def get_commit_status(commit, context=None, fork="obspy", token=None):
+def get_commit_status(commit, context=None, fork="obspy", token=None, repo="obspy"):
     """
     Return current commit status. Either for a specific context, or overall.
 
@@ -185,6 +659,8 @@ def get_commit_status(commit, context=None, fork="obspy", token=None):
     :type fork: str
     :param fork: Obspy fork for commit (for commits on pull requests, 'obspy'
         should also work for commits on forks).
+    :type repo: str
+    :param repo: Name of the repository.
     :rtype: str or ``None``
     :returns: Current commit status (overall or for specific context) as a
         string or ``None`` if given context has no status.
@@ -193,8 +669,8 @@ def get_commit_status(commit, context=None, fork="obspy", token=None):
     # github3.py seems to lack support for fetching the "current" statuses for
     # all contexts.. (which is available in "combined status" for an SHA
     # through github API)
-    repo = gh.repository(fork, "obspy")
-    commit = repo.commit(commit)
+    repository = gh.repository(fork, repo)
+    commit = repository.commit(commit)
     statuses = {}
     for status in commit.statuses():
         if (
@@ -218,61 +694,146 @@ def get_commit_status(commit, context=None, fork="obspy", token=None):
     return None
 
 
-def get_commit_time(commit, fork="obspy", token=None):
+def get_commit_time(commit, fork="obspy", token=None, repo="obspy"):
     """
     :rtype: float
     :returns: Commit timestamp as POSIX timestamp.
     """
     gh = get_github_client(token)
-    repo = gh.repository(fork, "obspy")
-    commit = repo.commit(commit)
+    repository = gh.repository(fork, repo)
+    commit = repository.commit(commit)
     dt = datetime.datetime.strptime(
         commit.commit["committer"]["date"], "%Y-%m-%dT%H:%M:%SZ"
     )
     return dt.timestamp()
 
 
-def get_issue_numbers_that_request_docs_build(verbose=False, token=None):
+def search_docs_build_candidates(token=None, owner="obspy", repo="obspy"):
+    """
+    Use GitHub's issue search to find open PRs that might request a docs build.
+
+    The search is a cheap pre-filter only, it is not guaranteed to match the
+    exact magic string, so candidates still have to be verified with
+    :func:`check_docs_build_requested`. GitHub's search ignores punctuation
+    like the '+', so the query really matches any open PR mentioning "docs"
+    in its description or comments.
+
+    :rtype: list of int or ``None``
+    :returns: Candidate PR numbers (recently updated first) or ``None`` if
+        the search API is not available.
     """
+    gh = get_github_client(token)
+    query = 'repo:{}/{} is:pr is:open "+DOCS" in:body,comments'.format(owner, repo)
+    try:
+        results = gh.search_issues(
+            query, sort="updated", order="desc", per_page=MAX_PER_PAGE
+        )
+        return [result.issue.number for result in results]
+    except github3.exceptions.GitHubError as e:
+        msg = "GitHub issue search failed ({}), falling back to full scan".format(e)
+        warnings.warn(msg)
+        return None
+
+
+def get_issue_numbers_that_request_docs_build(
+    verbose=False, token=None, use_search=True, owner="obspy", repo="obspy"
+):
+    """
+    :type use_search: bool
+    :param use_search: Whether to narrow down the PRs to check using the
+        GitHub issue search first (see :func:`search_docs_build_candidates`).
+        If the search is not available all open PRs are checked.
     :rtype: list of int
     """
-    open_prs = get_pull_requests(state="open", token=token)
+    candidates = None
+    if use_search:
+        candidates = search_docs_build_candidates(token=token, owner=owner, repo=repo)
+    if candidates is None:
+        with get_pull_requests(
+            state="open", token=token, owner=owner, repo=repo
+        ) as open_prs:
+            candidates = [pr.number for pr in open_prs]
 
     if verbose:
         print(
             "Checking the following open PRs if a docs build is requested "
-            "and needed: {}".format(str(num for num, _ in open_prs))
+            "and needed: {}".format(", ".join(str(num) for num in candidates))
         )
 
     todo = []
-    for pr in open_prs:
-        if check_docs_build_requested(pr.number):
-            todo.append(pr.number)
+    for number in candidates:
+        if _budget_exhausted():
+            _warn_budget_exhausted(owner, repo)
+            break
+        if check_docs_build_requested(number, token=token, owner=owner, repo=repo):
+            todo.append(number)
 
     return todo
 
 
+def get_issue_numbers_that_request_docs_build_multi_repo(
+    repositories, verbose=False, token=None, use_search=True
+):
+    """
+    Run :func:`get_issue_numbers_that_request_docs_build` for multiple
+    repositories (e.g. 'obspy/obspy') in one process, see :func:`fan_out`.
+
+    :rtype: dict
+    :returns: Mapping of repository names to lists of PR numbers.
+    """
+    tasks = {}
+    for name in repositories:
+        owner, repo = parse_repository(name)
+        tasks[name] = partial(
+            get_issue_numbers_that_request_docs_build,
+            verbose=verbose,
+            token=token,
+            use_search=use_search,
+            owner=owner,
+            repo=repo,
+        )
+    return fan_out(tasks, token=token)
+
+
 def set_pr_docs_that_need_docs_build(
-    pr_docs_info_dir="/home/obspy/pull_request_docs", verbose=False, token=None
+    pr_docs_info_dir="/home/obspy/pull_request_docs",
+    verbose=False,
+    token=None,
+    owner="obspy",
+    repo="obspy",
 ):
     """
     Relies on a local directory with some files to mark when PR docs have been
     built etc.
+
+    Files for obspy/obspy are stored directly in ``pr_docs_info_dir``, files
+    for other repositories in a subdirectory ``OWNER/REPO``, so that PRs with
+    the same number in different repositories don't collide.
     """
-    prs_todo = get_issue_numbers_that_request_docs_build(verbose=verbose, token=token)
+    if (owner, repo) != ("obspy", "obspy"):
+        pr_docs_info_dir = os.path.join(pr_docs_info_dir, owner, repo)
+        os.makedirs(pr_docs_info_dir, exist_ok=True)
 
-    for pr in prs_todo:
-        number = pr.number
+    gh = get_github_client(token)
+    prs_todo = get_issue_numbers_that_request_docs_build(
+        verbose=verbose, token=token, owner=owner, repo=repo
+    )
+
+    for number in prs_todo:
+        if _budget_exhausted():
+            _warn_budget_exhausted(owner, repo)
+            break
+        pr = gh.pull_request(owner, repo, number)
         fork = pr.head.user.login
         branch = pr.head.ref
         commit = pr.head.sha
 
         # need to figure out time of last push from commit details.. -_-
-        time = get_commit_time(commit, fork)
+        time = get_commit_time(commit, fork, token=token, repo=repo)
         if verbose:
             print(
                 "PR #{} requests a docs build, latest commit {} at "
-                "{}.".format(number, commit, str(datetime.fromtimestamp(time)))
+                "{}.".format(number, commit, str(datetime.datetime.fromtimestamp(time)))
             )
 
         filename = os.path.join(pr_docs_info_dir, str(number))
@@ -295,7 +856,7 @@ def set_pr_docs_that_need_docs_build(
                     print(
                         "PR #{} was last built at {} and does not need a "
                         "new build.".format(
-                            number, str(datetime.fromtimestamp(time_done))
+                            number, str(datetime.datetime.fromtimestamp(time_done))
                         )
                     )
                 continue
@@ -308,6 +869,30 @@ def set_pr_docs_that_need_docs_build(
         print("Done checking which PRs require a docs build.")
 
 
+def set_pr_docs_that_need_docs_build_multi_repo(
+    repositories,
+    pr_docs_info_dir="/home/obspy/pull_request_docs",
+    verbose=False,
+    token=None,
+):
+    """
+    Run :func:`set_pr_docs_that_need_docs_build` for multiple repositories
+    (e.g. 'obspy/obspy') in one process, see :func:`fan_out`.
+    """
+    tasks = {}
+    for name in repositories:
+        owner, repo = parse_repository(name)
+        tasks[name] = partial(
+            set_pr_docs_that_need_docs_build,
+            pr_docs_info_dir=pr_docs_info_dir,
+            verbose=verbose,
+            token=token,
+            owner=owner,
+            repo=repo,
+        )
+    fan_out(tasks, token=token)
+
+
 def set_commit_status(
     commit,
     status,
@@ -319,6 +904,7 @@ def set_commit_status(
     only_when_no_status_yet=False,
     verbose=False,
     token=None,
+    repo="obspy",
 ):
     """
     :param only_when_changed: Whether to only set a status if the commit status
@@ -338,7 +924,9 @@ def set_commit_status(
     # if status would not change.. do nothing, don't send that same status
     # again
     if only_when_changed or only_when_no_status_yet:
-        current_status = get_commit_status(commit, context)
+        current_status = get_commit_status(
+            commit, context, fork=fork, token=token, repo=repo
+        )
         if only_when_no_status_yet:
             if current_status is not None:
                 if verbose:
@@ -356,9 +944,9 @@ def set_commit_status(
                     )
                 return
 
-    repo = gh.repository(fork, "obspy")
-    commit = repo.commit(commit)
-    repo.create_status(
+    repository = gh.repository(fork, repo)
+    commit = repository.commit(commit)
+    repository.create_status(
         sha=commit.sha,
         state=status,
         context=context,
@@ -373,24 +961,31 @@ def set_commit_status(
         )
 
 
-def set_all_updated_pull_requests_docker_testbot_pending(verbose=False, token=None):
+def set_all_updated_pull_requests_docker_testbot_pending(
+    verbose=False, token=None, owner="obspy", repo="obspy"
+):
     """
     Set a status "pending" for all open PRs that have not been processed by
     docker buildbot yet.
     """
 
-    open_prs = get_pull_requests(state="open", token=token)
-    if verbose:
-        print("Working on PRs: " + ", ".join([str(pr.number) for pr in open_prs]))
-    for pr in open_prs:
-        set_commit_status(
-            commit=pr.head.sha,
-            status="pending",
-            context="docker-testbot",
-            description="docker testbot results not available yet",
-            only_when_no_status_yet=True,
-            verbose=verbose,
-        )
+    with get_pull_requests(
+        state="open", token=token, owner=owner, repo=repo
+    ) as open_prs:
+        if verbose:
+            print("Working on PRs: " + ", ".join([str(pr.number) for pr in open_prs]))
+        for pr in open_prs:
+            set_commit_status(
+                commit=pr.head.sha,
+                status="pending",
+                context="docker-testbot",
+                description="docker testbot results not available yet",
+                fork=owner,
+                only_when_no_status_yet=True,
+                verbose=verbose,
+                token=token,
+                repo=repo,
+            )
 
 
 def get_docker_build_targets(
@@ -398,6 +993,8 @@ def get_docker_build_targets(
     branches=["master", "maintenance_1.0.x"],
     prs=True,
     token=None,
+    owner="obspy",
+    repo="obspy",
 ):
     """
     Returns a list of build targets that need a build of a given context.
@@ -415,6 +1012,8 @@ def get_docker_build_targets(
     :param context: Commit status context to check.
     :type branches: list
     :param branches: Branches to include as potential build targets.
+        Branches which don't exist in the repository are skipped with a
+        warning.
     :type prs: bool
     :param prs: Whether to include open pull requests as potential build
         targets or not.
@@ -428,32 +1027,96 @@ def get_docker_build_targets(
     gh = get_github_client(token)
     status_needs_build = (None, "pending")
     targets = []
-    repo = gh.repository("obspy", "obspy")
+    repository = gh.repository(owner, repo)
+
+    def get_status(sha):
+        return get_commit_status(
+            sha, context=context, fork=owner, token=token, repo=repo
+        )
 
     if branches:
         for name in branches:
-            branch = repo.branch(name)
+            try:
+                branch = repository.branch(name)
+            except github3.exceptions.NotFoundError:
+                msg = "Branch {} not found in {}/{}, skipping it".format(
+                    name, owner, repo
+                )
+                warnings.warn(msg)
+                continue
             sha = branch.commit.sha
-            status = get_commit_status(sha, context=context)
+            status = get_status(sha)
             if status not in status_needs_build:
                 continue
             # branches don't have a PR number, use dummy placeholder 'XXX' so
             # that variable splitting in bash still works
-            targets.append("XXX_obspy:{}".format(sha))
+            targets.append("XXX_{}:{}".format(owner, sha))
 
     if prs:
-        open_prs = get_pull_requests(state="open")
-        for pr in open_prs:
-            fork = pr.head.user
-            sha = pr.head.sha
-            status = get_commit_status(sha, context=context)
-            if status not in status_needs_build:
-                continue
-            targets.append("{}_{}:{}".format(str(pr.number), fork, sha))
+        with get_pull_requests(
+            state="open", token=token, owner=owner, repo=repo
+        ) as open_prs:
+            for pr in open_prs:
+                if _budget_exhausted():
+                    _warn_budget_exhausted(owner, repo)
+                    break
+                fork = pr.head.user
+                sha = pr.head.sha
+                status = get_status(sha)
+                if status not in status_needs_build:
+                    continue
+                targets.append("{}_{}:{}".format(str(pr.number), fork, sha))
 
     return " ".join(targets)
 
 
+def get_docker_build_targets_multi_repo(
+    repositories,
+    context="docker-testbot",
+    branches=None,
+    prs=True,
+    token=None,
+):
+    """
+    Run :func:`get_docker_build_targets` for multiple repositories (e.g.
+    'obspy/obspy') in one process, see :func:`fan_out`.
+
+    :type branches: list or dict
+    :param branches: Branches to include as potential build targets, either
+        a list used for all repositories or a mapping of repository names to
+        lists. Repositories without given branches use their default branch.
+    :rtype: dict
+    :returns: Mapping of repository names to build target strings.
+    """
+    if not isinstance(branches, dict):
+        branches = {name: branches for name in repositories}
+    tasks = {}
+    for name in repositories:
+        owner, repo = parse_repository(name)
+        tasks[name] = partial(
+            _get_docker_build_targets_or_default_branch,
+            context=context,
+            branches=branches.get(name),
+            prs=prs,
+            token=token,
+            owner=owner,
+            repo=repo,
+        )
+    return fan_out(tasks, token=token)
+
+
+def _get_docker_build_targets_or_default_branch(branches=None, **kwargs):
+    """
+    Call :func:`get_docker_build_targets`, using the repository's default
+    branch if ``branches`` is ``None``.
+    """
+    if branches is None:
+        gh = get_github_client(kwargs.get("token"))
+        repository = gh.repository(kwargs["owner"], kwargs["repo"])
+        branches = [repository.default_branch]
+    return get_docker_build_targets(branches=branches, **kwargs)
+
+
 def _append_obspy(module_list):
     """
     Append the string 'obspy.' to each string in module list for use in coverage.
@@ -462,24 +1125,213 @@ def _append_obspy(module_list):
     return module_list_obspy_prepended
 
 
-def make_ci_json_config(issue_number, path="obspy_ci_conf.json", token=None):
+def read_module_durations(path):
     """
-    Make a json file for configuring additional actions in CI.
+    Read historical per-module test durations (in seconds) from a file.
 
-    Indicates which modules are to be run by tests and if docs are to be built.
+    Either a json file with a single {module: duration} mapping or a csv file
+    with rows of ``module,duration`` (an optional header row is skipped, any
+    other invalid row raises a ``ValueError``).
+    Module names may be given with or without leading 'obspy.'.
+
+    :rtype: dict
+    """
+    path = Path(path)
+    with path.open("r") as fi:
+        if path.suffix.lower() == ".json":
+            raw = json.load(fi)
+        else:
+            raw = {}
+            reader = csv.reader(fi)
+            for i, row in enumerate(reader):
+                if not row:
+                    continue
+                try:
+                    raw[row[0].strip()] = float(row[1])
+                except (IndexError, ValueError):
+                    if i == 0:  # header row
+                        continue
+                    msg = "Invalid row in {} (line {}): {}".format(
+                        path, reader.line_num, ",".join(row)
+                    )
+                    raise ValueError(msg)
+    out = {}
+    for mod, duration in raw.items():
+        if mod.startswith("obspy."):
+            mod = mod[len("obspy.") :]
+        out[mod] = float(duration)
+    return out
+
+
+def split_modules_into_shards(module_list, n_shards, durations=None):
+    """
+    Split modules into shards with balanced total test duration.
+
+    Uses a greedy longest-first algorithm, i.e. modules are assigned in order
+    of decreasing duration to the shard with the lowest total duration so
+    far. Modules without a known duration are assumed to take the mean of
+    all known durations.
+
+    :type n_shards: int
+    :param n_shards: Number of shards to split modules into.
+    :type durations: dict
+    :param durations: Mapping of module name to duration (see
+        :func:`read_module_durations`). If not given, modules are only
+        balanced by count.
+    :rtype: list of list
+    :returns: List of ``n_shards`` sorted module lists (some might be empty).
+    """
+    if n_shards < 1:
+        raise ValueError("Invalid number of shards: {}".format(n_shards))
+    durations = durations or {}
+    known = [durations[mod] for mod in module_list if mod in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weighted = sorted(
+        ((durations.get(mod, default), mod) for mod in module_list),
+        key=lambda x: (-x[0], x[1]),
+    )
+    shards = [[] for _ in range(n_shards)]
+    heap = [(0.0, i) for i in range(n_shards)]
+    for duration, mod in weighted:
+        total, i = heapq.heappop(heap)
+        shards[i].append(mod)
+        heapq.heappush(heap, (total + duration, i))
+    return [sorted(shard) for shard in shards]
+
+
+def _make_ci_config_dict(
+    issue_number, token=None, changed_files=False, owner="obspy", repo="obspy"
+):
+    """
+    Return the dict stored by :func:`make_ci_json_config`.
     """
     # It would be interesting to make this more generic by parsing any magic
     # comment string to use for later actions.
-    module_list = get_module_test_list(issue_number, token=token)
-    docs = check_docs_build_requested(issue_number, token=token)
+    module_list = get_module_test_list(
+        issue_number,
+        token=token,
+        changed_files=changed_files,
+        owner=owner,
+        repo=repo,
+    )
+    _check_budget()
+    docs = check_docs_build_requested(issue_number, token=token, owner=owner, repo=repo)
     module_list_obspy_prepended = _append_obspy(module_list)
 
-    out = dict(
+    return dict(
         module_list=",".join(module_list_obspy_prepended),
         module_list_spaces=" ".join(module_list),
         docs=docs,
     )
 
+
+def make_ci_json_config(
+    issue_number,
+    path="obspy_ci_conf.json",
+    token=None,
+    cache_dir=None,
+    changed_files=False,
+    shards=1,
+    durations_path=None,
+    owner="obspy",
+    repo="obspy",
+):
+    """
+    Make a json file for configuring additional actions in CI.
+
+    Indicates which modules are to be run by tests and if docs are to be built.
+
+    If ``cache_dir`` is given, the config is cached there keyed by issue
+    number and the issue's last update time. Concurrent processes (e.g. all
+    jobs of a CI matrix) then only query the issue and its comments once and
+    reuse the result of the first process. Each process still needs one API
+    request to look up the issue's last update time.
+
+    If ``changed_files`` is ``True``, modules touched by the pull request's
+    changed files are tested in addition to the requested and default ones.
+
+    If ``shards`` is larger than one, the module list is additionally split
+    into that many shards balanced by the historical test durations in
+    ``durations_path`` (see :func:`split_modules_into_shards`), stored as
+    ``module_list_shard_N`` and ``module_list_spaces_shard_N``.
+    """
+    if shards < 1:
+        raise ValueError("Invalid number of shards: {}".format(shards))
+    issue_key = None
+    if cache_dir is not None:
+        issue_key = _get_issue_cache_key(issue_number, token, owner=owner, repo=repo)
+    out = _cached_call(
+        cache_dir,
+        "ci_config_changed_files" if changed_files else "ci_config",
+        issue_key,
+        lambda: _make_ci_config_dict(
+            issue_number,
+            token=token,
+            changed_files=changed_files,
+            owner=owner,
+            repo=repo,
+        ),
+    )
+
+    if shards > 1:
+        durations = read_module_durations(durations_path) if durations_path else None
+        module_list = out["module_list_spaces"].split()
+        out = dict(out, shards=shards)
+        for i, shard in enumerate(
+            split_modules_into_shards(module_list, shards, durations)
+        ):
+            out["module_list_shard_{}".format(i)] = ",".join(_append_obspy(shard))
+            out["module_list_spaces_shard_{}".format(i)] = " ".join(shard)
+
+    # Write output to file if path is not None
+    if path is not None:
+        path = Path(path)
+        path_dir = path if path.is_dir() else path.parent
+        path_dir.mkdir(exist_ok=True, parents=True)
+        with path.open("w") as fi:
+            json.dump(out, fi, indent=4)
+
+    return out
+
+
+def make_ci_json_config_multi_repo(
+    issues,
+    path="obspy_ci_conf.json",
+    token=None,
+    cache_dir=None,
+    changed_files=False,
+    shards=1,
+    durations_path=None,
+):
+    """
+    Make a json file with the CI configuration of multiple issues from
+    possibly different repositories, see :func:`make_ci_json_config` and
+    :func:`fan_out`.
+
+    :type issues: list of str
+    :param issues: Issues to make the config for, e.g. 'obspy/obspy#101'.
+    :raises FanOutError: If the config could not be made for any of the
+        issues. No file is written in that case.
+    :rtype: dict
+    :returns: Mapping of issue names to their configuration dicts.
+    """
+    tasks = {}
+    for name in issues:
+        owner, repo, issue_number = parse_issue(name)
+        tasks[name] = partial(
+            make_ci_json_config,
+            issue_number,
+            path=None,
+            token=token,
+            cache_dir=cache_dir,
+            changed_files=changed_files,
+            shards=shards,
+            durations_path=durations_path,
+            owner=owner,
+            repo=repo,
+        )
+    out = fan_out(tasks, token=token, raise_errors=True)
+
     # Write output to file if path is not None
     if path is not None:
         path = Path(path)
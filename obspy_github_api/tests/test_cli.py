@@ -46,6 +46,16 @@ class TestCli:
         out = run(run_str, shell=True, capture_output=True)
         assert out.stdout.decode("utf8").rstrip() == "False"
 
+    def test_read_config_value_multi_repo(self, tmpdir_factory):
+        """Ensure values of multi-repository config files are readable."""
+        issue = f"obspy/obspy#{self.pr_number}"
+        path = Path(tmpdir_factory.mktemp("obspy_config")) / "conf.json"
+        run_str = f"obshub make-config-multi-repo {issue} --path {path}"
+        run(run_str, shell=True, check=True)
+        run_str = f"obshub read-config-value docs --issue {issue} --path {path}"
+        out = run(run_str, shell=True, capture_output=True)
+        assert out.stdout.decode("utf8").rstrip() == "False"
+
     def test_get_module_lists(self):
         """Ensure module lists are retrievable. """
         run_str = f"obshub get-module-list --sep ' '"
@@ -54,3 +64,33 @@ class TestCli:
         assert len(mod_list) > 5
         for mod in mod_list:
             assert mod.startswith("obspy.")
+
+    def test_get_module_list_shards(self):
+        """Ensure the shards of the module list cover all modules."""
+        mod_lists = []
+        for shard_index in range(2):
+            run_str = (
+                f"obshub get-module-list --sep ' ' --shards 2 "
+                f"--shard-index {shard_index}"
+            )
+            out = run(run_str, shell=True, capture_output=True)
+            mod_lists.append(out.stdout.decode("utf8").rstrip().split(" "))
+        out = run("obshub get-module-list --sep ' '", shell=True, capture_output=True)
+        mod_list = out.stdout.decode("utf8").rstrip().split(" ")
+        assert sorted(mod_lists[0] + mod_lists[1]) == sorted(mod_list)
+
+    @pytest.mark.parametrize(
+        "options", ["--shards 0", "--shards -1", "--shards 1 --shard-index 3"]
+    )
+    def test_get_module_list_invalid_shards(self, options):
+        """Invalid shard options should be rejected."""
+        run_str = f"obshub get-module-list {options}"
+        out = run(run_str, shell=True, capture_output=True)
+        assert out.returncode != 0
+        assert not out.stdout
+
+    def test_make_config_invalid_shards(self, config_path):
+        """Invalid number of shards should be rejected."""
+        run_str = f"obshub make-config {self.pr_number} --path {config_path} --shards 0"
+        out = run(run_str, shell=True, capture_output=True)
+        assert out.returncode != 0
@@ -1,14 +1,43 @@
 # -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import github3
 import mock
+import pytest
 
 from obspy_github_api import (
     check_docs_build_requested,
+    get_changed_files,
     get_requested_modules,
     get_commit_status,
     get_commit_time,
     get_issue_numbers_that_request_docs_build,
+    get_module_path_index,
+    get_paginated_listing,
     get_module_test_list,
+    get_modules_for_paths,
     make_ci_json_config,
+    parse_issue,
+    parse_repository,
+    RateLimitBudgetExceeded,
+    read_module_durations,
+    get_docker_build_targets_multi_repo,
+    make_ci_json_config_multi_repo,
+    PaginatedListing,
+    search_docs_build_candidates,
+    set_pr_docs_that_need_docs_build_multi_repo,
+    split_modules_into_shards,
+)
+from obspy_github_api.obspy_github_api import (
+    _budget_exhausted,
+    _count_request,
+    _rate_limit_budget,
+    _single_flight,
+    fan_out,
+    FanOutError,
 )
 
 
@@ -16,6 +45,34 @@ MOCK_DEFAULT_MODULES = ["core", "clients.arclink"]
 MOCK_ALL_MODULES = MOCK_DEFAULT_MODULES + ["clients.fdsn", "geodetics"]
 
 
+class FakeIterator:
+    """
+    Stand-in for a github3 iterator, recording the items fetched from it.
+
+    Calls ``on_item`` before yielding each item and sets the ``stopped``
+    event once iteration stops.
+    """
+
+    def __init__(self, n_items, on_item=None):
+        self.params = {}
+        self.calls = 0
+        self.fetched = []
+        self.stopped = threading.Event()
+        self._n_items = n_items
+        self._on_item = on_item
+
+    def __iter__(self):
+        self.calls += 1
+        try:
+            for i in range(self._n_items):
+                if self._on_item is not None:
+                    self._on_item(i)
+                self.fetched.append(i)
+                yield i
+        finally:
+            self.stopped.set()
+
+
 def test_check_docs_build_requested():
     assert check_docs_build_requested(100) is False
     assert check_docs_build_requested(101) is True
@@ -41,6 +98,296 @@ def test_get_module_test_list():
     )
 
 
+def test_get_changed_files():
+    # pr = 1507
+    paths = get_changed_files(1507)
+    assert len(paths) > 0
+    for path in paths:
+        assert isinstance(path, str)
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_github_client")
+def test_get_changed_files_no_pull_request(get_github_client):
+    """Issues which are not pull requests have no changed files."""
+    gh = get_github_client.return_value
+    gh.pull_request.return_value = None
+    assert get_changed_files(100) == []
+    gh.pull_request.side_effect = github3.exceptions.NotFoundError(mock.MagicMock())
+    assert get_changed_files(100) == []
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_changed_files")
+@mock.patch("obspy_github_api.obspy_github_api.get_requested_modules")
+@mock.patch("obspy_github_api.obspy_github_api.get_obspy_module_lists")
+def test_get_module_test_list_changed_files(
+    get_obspy_module_lists, get_requested_modules, get_changed_files
+):
+    get_obspy_module_lists.return_value = dict(
+        all=MOCK_ALL_MODULES, default=MOCK_DEFAULT_MODULES, network=[]
+    )
+    get_requested_modules.return_value = False
+    get_changed_files.return_value = [
+        "obspy/geodetics/base.py",
+        "obspy/unknown_module/base.py",
+        "README.md",
+    ]
+    assert get_module_test_list(1507) == sorted(MOCK_DEFAULT_MODULES)
+    get_changed_files.assert_not_called()
+    assert get_module_test_list(1507, changed_files=True) == sorted(
+        MOCK_DEFAULT_MODULES + ["geodetics"]
+    )
+    # explicitly requested modules are merged with the changed ones
+    get_requested_modules.return_value = ["clients.fdsn"]
+    assert get_module_test_list(1507, changed_files=True) == sorted(
+        MOCK_DEFAULT_MODULES + ["clients.fdsn", "geodetics"]
+    )
+
+
+def test_single_flight(tmpdir):
+    """The cached result should be reused for the same key."""
+    calls = []
+
+    def func():
+        calls.append(1)
+        return ["core", "io"]
+
+    assert _single_flight(tmpdir, "key", func) == ["core", "io"]
+    assert _single_flight(tmpdir, "key", func) == ["core", "io"]
+    assert len(calls) == 1
+    assert _single_flight(tmpdir, "other_key", func) == ["core", "io"]
+    assert len(calls) == 2
+    # without a cache dir the function is always called
+    _single_flight(None, "key", func)
+    assert len(calls) == 3
+
+
+def test_single_flight_concurrent(tmpdir):
+    """Concurrent callers should wait for and reuse the first result."""
+    calls = []
+
+    def func():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [
+            executor.submit(_single_flight, tmpdir, "key", func) for _ in range(5)
+        ]
+        results = [future.result() for future in futures]
+    assert results == [1] * 5
+    assert len(calls) == 1
+
+
+@mock.patch("obspy_github_api.obspy_github_api._make_ci_config_dict")
+@mock.patch("obspy_github_api.obspy_github_api._get_issue_cache_key")
+def test_make_ci_json_config_cached(get_issue_cache_key, make_ci_config_dict, tmpdir):
+    """The issue should only be fetched once per call to build the cache key."""
+    get_issue_cache_key.return_value = "obspy_obspy_100_20200101T000000"
+    make_ci_config_dict.return_value = dict(
+        module_list="obspy.core", module_list_spaces="core", docs=False
+    )
+    for _ in range(3):
+        out = make_ci_json_config(100, path=None, cache_dir=tmpdir)
+        assert out == make_ci_config_dict.return_value
+    assert get_issue_cache_key.call_count == 3
+    assert make_ci_config_dict.call_count == 1
+
+
+def test_get_modules_for_paths():
+    path_index = get_module_path_index(MOCK_ALL_MODULES + ["clients"])
+    paths = [
+        "obspy/clients/fdsn/client.py",
+        "obspy/clients/fdsn/tests/data/some_file.xml",
+        "obspy/clients/filesystem/sds.py",
+        "obspy/geodetics/base.py",
+        "obspy/__init__.py",
+        "README.md",
+    ]
+    assert get_modules_for_paths(paths, path_index) == [
+        "clients",
+        "clients.fdsn",
+        "geodetics",
+    ]
+
+
+def test_split_modules_into_shards():
+    modules = ["clients.fdsn", "core", "geodetics", "io.mseed", "signal"]
+    durations = {
+        "clients.fdsn": 100.0,
+        "core": 60.0,
+        "geodetics": 5.0,
+        "io.mseed": 40.0,
+    }
+    # "signal" has no known duration and is assumed to take the mean (51.25)
+    shards = split_modules_into_shards(modules, 2, durations)
+    assert shards == [["clients.fdsn", "io.mseed"], ["core", "geodetics", "signal"]]
+    # without durations modules are balanced by count
+    shards = split_modules_into_shards(modules, 2)
+    assert sorted(len(shard) for shard in shards) == [2, 3]
+    assert sorted(sum(shards, [])) == modules
+    # invalid number of shards
+    for n_shards in (0, -1):
+        with pytest.raises(ValueError):
+            split_modules_into_shards(modules, n_shards)
+        with pytest.raises(ValueError):
+            make_ci_json_config(100, path=None, shards=n_shards)
+
+
+def test_read_module_durations(tmpdir):
+    json_path = Path(tmpdir) / "durations.json"
+    json_path.write_text('{"obspy.core": 60, "geodetics": 5.5}')
+    csv_path = Path(tmpdir) / "durations.csv"
+    csv_path.write_text("module,duration\nobspy.core,60\ngeodetics,5.5\n")
+    expected = {"core": 60.0, "geodetics": 5.5}
+    assert read_module_durations(json_path) == expected
+    assert read_module_durations(csv_path) == expected
+    # only the first row may be a header
+    csv_path.write_text("module,duration\nobspy.core,6O\ngeodetics,5.5\n")
+    with pytest.raises(ValueError, match="line 2"):
+        read_module_durations(csv_path)
+    csv_path.write_text("obspy.core,60\ngeodetics\n")
+    with pytest.raises(ValueError, match="line 2"):
+        read_module_durations(csv_path)
+
+
+def test_paginated_listing():
+    """The listing should be reusable and only consume the iterator once."""
+    iterator = FakeIterator(250)
+    with get_paginated_listing(iterator) as listing:
+        assert iterator.params["per_page"] == 100
+        assert list(listing) == list(range(250))
+        assert list(listing) == list(range(250))
+        assert len(listing) == 250
+    assert iterator.calls == 1
+
+
+def test_paginated_listing_lookahead():
+    """Only one page should be fetched ahead and closing stops fetching."""
+    # the consumer stops after item 24, so the background thread may fetch
+    # up to 10 more items (items 0 ... 33) and then has to wait
+    last_page_item = threading.Event()
+
+    def on_item(i):
+        if i == 33:
+            last_page_item.set()
+
+    iterator = FakeIterator(1000, on_item=on_item)
+    with get_paginated_listing(iterator, per_page=10) as listing:
+        for i, item in enumerate(listing):
+            if i == 24:
+                break
+        assert last_page_item.wait(timeout=10)
+        assert not iterator.stopped.is_set()
+    assert iterator.stopped.wait(timeout=10)
+    assert iterator.fetched == list(range(34))
+    # items fetched so far remain available
+    assert list(listing) == list(range(34))
+
+
+def test_paginated_listing_closed_on_error():
+    """The background thread should stop if the consumer fails or never
+    iterates the listing."""
+    iterator = FakeIterator(1000)
+    with pytest.raises(RuntimeError):
+        with get_paginated_listing(iterator, per_page=10) as listing:
+            for item in listing:
+                raise RuntimeError()
+    assert iterator.stopped.wait(timeout=10)
+    iterator = FakeIterator(1000)
+    with get_paginated_listing(iterator, per_page=10):
+        pass
+    assert iterator.stopped.wait(timeout=10)
+    assert len(iterator.fetched) <= 10
+
+
+def test_parse_repository():
+    assert parse_repository("obspy/obspy") == ("obspy", "obspy")
+    assert parse_issue("obspy/obspy_github_api#12") == ("obspy", "obspy_github_api", 12)
+    for name in ("obspy", "obspy/", "/obspy", "a/b/c"):
+        with pytest.raises(ValueError):
+            parse_repository(name)
+    with pytest.raises(ValueError):
+        parse_issue("obspy/obspy#abc")
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_rate_limit_remaining")
+def test_fan_out(get_rate_limit_remaining):
+    """Each task should stop after its share of the rate limit."""
+    get_rate_limit_remaining.return_value = 10
+
+    def scan():
+        n_requests = 0
+        while not _budget_exhausted():
+            _count_request(None)
+            n_requests += 1
+        return n_requests
+
+    def listing():
+        # one request per item
+        iterator = FakeIterator(100, on_item=lambda i: _count_request(None))
+        with get_paginated_listing(iterator) as listing:
+            return len(listing)
+
+    tasks = {"obspy/obspy": scan, "obspy/obspy_github_api": listing}
+    assert fan_out(tasks) == {"obspy/obspy": 5, "obspy/obspy_github_api": 5}
+    # no budget outside of tasks or if the rate limit is unknown
+    assert not _budget_exhausted()
+    get_rate_limit_remaining.return_value = None
+    assert fan_out({"obspy/obspy": lambda: 1}) == {"obspy/obspy": 1}
+    assert fan_out({}) == {}
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_module_test_list")
+def test_make_ci_json_config_budget(get_module_test_list):
+    """Making a config should stop once the budget is used up."""
+    get_module_test_list.side_effect = lambda *args, **kwargs: _count_request(None)
+    with _rate_limit_budget(1):
+        with pytest.raises(RateLimitBudgetExceeded):
+            make_ci_json_config(100, path=None)
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_rate_limit_remaining")
+def test_fan_out_failing_task(get_rate_limit_remaining):
+    """A failing task should not affect the results of the other tasks."""
+    get_rate_limit_remaining.return_value = 100
+
+    def fail():
+        raise github3.exceptions.GitHubError(mock.MagicMock())
+
+    tasks = {"obspy/obspy": lambda: 1, "obspy/typo": fail}
+    with pytest.warns(UserWarning, match="obspy/typo"):
+        assert fan_out(tasks) == {"obspy/obspy": 1}
+    with pytest.raises(FanOutError) as e:
+        fan_out(tasks, raise_errors=True)
+    assert e.value.results == {"obspy/obspy": 1}
+    assert list(e.value.failed) == ["obspy/typo"]
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_rate_limit_remaining")
+@mock.patch("obspy_github_api.obspy_github_api.make_ci_json_config")
+def test_make_ci_json_config_multi_repo_fails(
+    make_ci_json_config, get_rate_limit, tmpdir
+):
+    """No config should be written if any issue could not be configured."""
+    get_rate_limit.return_value = None
+
+    def make_config(issue_number, **kwargs):
+        if kwargs["repo"] == "typo":
+            raise github3.exceptions.NotFoundError(mock.MagicMock())
+        return dict(docs=False)
+
+    make_ci_json_config.side_effect = make_config
+    path = Path(tmpdir) / "conf.json"
+    issues = ["obspy/obspy#100", "obspy/typo#100"]
+    with pytest.raises(FanOutError, match="obspy/typo#100"):
+        make_ci_json_config_multi_repo(issues, path=path)
+    assert not path.exists()
+    out = make_ci_json_config_multi_repo(issues[:1], path=path)
+    assert out == {"obspy/obspy#100": dict(docs=False)}
+    assert path.exists()
+
+
 def test_get_commit_status():
     # pr = 1507
     sha = "f74e0f5bcf26a47df6138c1ce026d9d14d68c4d7"
@@ -73,6 +420,133 @@ def test_get_issue_numbers_that_request_docs_build():
         assert isinstance(issue, int)
 
 
+def test_get_issue_numbers_that_request_docs_build_no_search():
+    """PRs found via the search pre-filter must also be found by a full scan."""
+    issues = get_issue_numbers_that_request_docs_build(use_search=False)
+    assert isinstance(issues, list)
+    assert set(get_issue_numbers_that_request_docs_build()) <= set(issues)
+
+
+@mock.patch("obspy_github_api.obspy_github_api.check_docs_build_requested")
+@mock.patch("obspy_github_api.obspy_github_api.get_pull_requests")
+@mock.patch("obspy_github_api.obspy_github_api.get_github_client")
+def test_get_issue_numbers_that_request_docs_build_search(
+    get_github_client, get_pull_requests, check_docs_build_requested
+):
+    """Only search candidates which really request a docs build are kept."""
+    gh = get_github_client.return_value
+    gh.search_issues.return_value = [
+        mock.MagicMock(**{"issue.number": number}) for number in (1, 2, 3)
+    ]
+    check_docs_build_requested.side_effect = lambda number, **kwargs: number == 2
+    assert get_issue_numbers_that_request_docs_build() == [2]
+    get_pull_requests.assert_not_called()
+    checked = [call[0][0] for call in check_docs_build_requested.call_args_list]
+    assert checked == [1, 2, 3]
+
+
+@mock.patch("obspy_github_api.obspy_github_api.check_docs_build_requested")
+@mock.patch("obspy_github_api.obspy_github_api.get_pull_requests")
+@mock.patch("obspy_github_api.obspy_github_api.get_github_client")
+def test_get_issue_numbers_that_request_docs_build_search_fails(
+    get_github_client, get_pull_requests, check_docs_build_requested
+):
+    """All open PRs should be checked if the search is not available."""
+    gh = get_github_client.return_value
+    gh.search_issues.side_effect = github3.exceptions.GitHubError(mock.MagicMock())
+    get_pull_requests.return_value = PaginatedListing(
+        iter([mock.MagicMock(number=number) for number in (4, 5, 6)])
+    )
+    check_docs_build_requested.side_effect = lambda number, **kwargs: number != 5
+    with pytest.warns(UserWarning, match="falling back to full scan"):
+        assert get_issue_numbers_that_request_docs_build() == [4, 6]
+    get_pull_requests.assert_called_once()
+
+
+def test_search_docs_build_candidates():
+    candidates = search_docs_build_candidates()
+    assert isinstance(candidates, list)
+    for candidate in candidates:
+        assert isinstance(candidate, int)
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_rate_limit_remaining")
+@mock.patch("obspy_github_api.obspy_github_api.get_commit_time")
+@mock.patch("obspy_github_api.obspy_github_api.get_github_client")
+@mock.patch(
+    "obspy_github_api.obspy_github_api.get_issue_numbers_that_request_docs_build"
+)
+def test_set_pr_docs_that_need_docs_build_multi_repo(
+    get_issue_numbers, get_github_client, get_commit_time, get_rate_limit, tmpdir
+):
+    """PRs with the same number in different repositories must not collide."""
+    get_issue_numbers.return_value = [5]
+    get_commit_time.return_value = 1471906365.0
+    get_rate_limit.return_value = None
+    pr = get_github_client.return_value.pull_request.return_value
+    pr.head.user.login = "some_user"
+    pr.head.ref = "some_branch"
+    repositories = ["obspy/obspy", "obspy/obspy_github_api"]
+    set_pr_docs_that_need_docs_build_multi_repo(repositories, pr_docs_info_dir=tmpdir)
+    for path in (
+        Path(tmpdir) / "5",
+        Path(tmpdir) / "obspy" / "obspy_github_api" / "5",
+    ):
+        assert path.read_text() == "some_user\nsome_branch\n"
+        assert path.with_suffix(".todo").exists()
+
+
+@mock.patch("obspy_github_api.obspy_github_api.get_rate_limit_remaining")
+@mock.patch("obspy_github_api.obspy_github_api.get_commit_status")
+@mock.patch("obspy_github_api.obspy_github_api.get_pull_requests")
+@mock.patch("obspy_github_api.obspy_github_api.get_github_client")
+def test_get_docker_build_targets_multi_repo(
+    get_github_client, get_pull_requests, get_commit_status, get_rate_limit
+):
+    """Missing branches should be skipped without losing the PR targets."""
+    get_rate_limit.return_value = None
+    get_commit_status.return_value = None
+    existing_branches = {
+        "obspy/obspy": ["master", "maintenance_1.0.x"],
+        "obspy/other": ["main"],
+    }
+
+    def repository(owner, repo):
+        name = "{}/{}".format(owner, repo)
+
+        def branch(branch_name):
+            if branch_name not in existing_branches[name]:
+                raise github3.exceptions.NotFoundError(mock.MagicMock())
+            return mock.MagicMock(**{"commit.sha": branch_name})
+
+        return mock.MagicMock(default_branch="main", branch=branch)
+
+    def pull_requests(owner, repo, **kwargs):
+        pr = mock.MagicMock(number=5, **{"head.user": owner, "head.sha": repo})
+        return PaginatedListing(iter([pr]))
+
+    get_github_client.return_value.repository.side_effect = repository
+    get_pull_requests.side_effect = pull_requests
+    repositories = ["obspy/obspy", "obspy/other"]
+
+    with pytest.warns(UserWarning, match="not found in obspy/other"):
+        targets = get_docker_build_targets_multi_repo(
+            repositories, branches=["master", "maintenance_1.0.x"]
+        )
+    assert targets == {
+        "obspy/obspy": "XXX_obspy:master XXX_obspy:maintenance_1.0.x 5_obspy:obspy",
+        "obspy/other": "5_obspy:other",
+    }
+    # branches per repository, falling back to the default branch
+    targets = get_docker_build_targets_multi_repo(
+        repositories, branches={"obspy/obspy": ["maintenance_1.0.x"]}
+    )
+    assert targets == {
+        "obspy/obspy": "XXX_obspy:maintenance_1.0.x 5_obspy:obspy",
+        "obspy/other": "XXX_obspy:main 5_obspy:other",
+    }
+
+
 class TestConfig:
     """Tests for creating the configuration file"""
 